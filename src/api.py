@@ -1,84 +1,230 @@
-# src/api.py
-
-from fastapi import FastAPI
-import pandas as pd
-from pathlib import Path
-from src import analysis
-
-app = FastAPI(
-    title="Retail Insights API",
-    description="A straightforward API for retail analytics."
-)
-
-# --- Data Loading ---
-DATA_FILE_PATH = Path(__file__).parent.parent / 'data' / 'processed_customer_data.parquet'
-try:
-    df = pd.read_parquet(DATA_FILE_PATH)
-    rfm_df = analysis.perform_rfm_kmeans_segmentation(df)
-    print("✅ Data loaded and initial analysis complete.")
-except FileNotFoundError:
-    print(f"❌ Error: Processed data file not found at '{DATA_FILE_PATH}'")
-    df = pd.DataFrame()
-    rfm_df = pd.DataFrame()
-
-# --- API Endpoints ---
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the Simplified Retail Insights API"}
-
-@app.get("/performance/stores")
-def get_store_performance():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.calculate_store_performance(df).to_dict('index')
-
-@app.get("/customers/top-customers")
-def get_top_customers():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.get_top_customers(df).to_dict('records')
-
-@app.get("/customers/value-segmentation")
-def get_value_segmentation():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.get_customer_value_segmentation(df).to_dict('records')
-
-@app.get("/insights/discount-impact")
-def get_discount_impact():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.get_discount_impact(df).to_dict('records')
-
-@app.get("/insights/seasonality")
-def get_seasonality():
-    if df.empty: return {"error": "Data not loaded."}
-    monthly, quarterly = analysis.analyze_seasonality(df)
-    return {
-        "monthly": monthly.to_dict('records'),
-        "quarterly": quarterly.to_dict('records')
-    }
-
-@app.get("/insights/payment-methods")
-def get_payment_methods():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.analyze_payment_methods(df).to_dict('records')
-
-@app.get("/customers/rfm-segments")
-def get_rfm_segments():
-    if rfm_df.empty: return {"error": "Data not loaded."}
-    return rfm_df.to_dict('records')
-
-# --- NEW ENDPOINTS ---
-
-@app.get("/customers/repeat-vs-onetime")
-def get_repeat_vs_onetime():
-    if df.empty: return {"error": "Data not loaded."}
-    return analysis.analyze_repeat_vs_onetime_customers(df).to_dict('records')
-
-@app.get("/insights/category-by-segment")
-def get_category_by_segment():
-    if df.empty or rfm_df.empty: return {"error": "Data not loaded."}
-    return analysis.get_category_insights_by_segment(df, rfm_df).to_dict('records')
-
-@app.get("/simulations/campaign")
-def simulate_campaign(target_segment: str, discount_pct: float = 0.10):
-    if rfm_df.empty: return {"error": "Data not loaded."}
-
-    return analysis.run_campaign_simulation(rfm_df, target_segment, discount_pct)
+# src/api.py
+
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import joblib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from src import analysis
+
+ARROW_STREAM_MIME = "application/vnd.apache.arrow.stream"
+
+app = FastAPI(
+    title="Retail Insights API",
+    description="A straightforward API for retail analytics.",
+    default_response_class=ORJSONResponse
+)
+
+def arrow_stream_bytes(frame: pd.DataFrame) -> bytes:
+    """Serializes a DataFrame as an Arrow IPC stream. Clients decode it
+    near-zero-copy instead of JSON-parsing one Python object per cell."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+# --- Data Loading ---
+DATA_FILE_PATH = Path(__file__).parent.parent / 'data' / 'processed_customer_data.parquet'
+RFM_CACHE_PATH = Path(__file__).parent.parent / 'data' / 'rfm_cache.parquet'
+MODEL_CACHE_PATH = Path(__file__).parent.parent / 'data' / 'kmeans_model.joblib'
+
+def _dataset_mtime(path: Path) -> float:
+    """Last-modified time of the processed dataset. The partitioned layout is
+    a directory whose own mtime doesn't move when part files are rewritten in
+    place, so take the newest mtime across the data files instead."""
+    if os.path.isdir(path):
+        mtimes = [os.path.getmtime(p) for p in path.rglob('*.parquet')]
+        if mtimes:
+            return max(mtimes)
+    return os.path.getmtime(path)
+
+def load_rfm_segments(df: pd.DataFrame) -> pd.DataFrame:
+    """Loads the clustered RFM table from cache, refitting only when the data changed."""
+    try:
+        if os.path.getmtime(RFM_CACHE_PATH) >= _dataset_mtime(DATA_FILE_PATH):
+            return pd.read_parquet(RFM_CACHE_PATH)
+    except OSError:
+        pass
+    rfm_df = analysis.perform_rfm_kmeans_segmentation(df)
+    if 'kmeans' in rfm_df.attrs:
+        joblib.dump((rfm_df.attrs['kmeans'], rfm_df.attrs['scaler']), MODEL_CACHE_PATH)
+    # pandas >= 2.1 json-serializes df.attrs into the parquet metadata, which
+    # chokes on the fitted estimator; it's already persisted via joblib above.
+    rfm_df.attrs = {}
+    rfm_df.to_parquet(RFM_CACHE_PATH, index=False)
+    return rfm_df
+
+# Only the columns the analysis functions touch — parquet is columnar, so
+# skipping the rest cuts startup I/O and resident memory proportionally.
+ANALYSIS_COLUMNS = [
+    'customer_id', 'customer_code', 'invoice_no', 'invoice_date', 'net_sales',
+    'total_sales', 'discount_amount', 'payment_method', 'shopping_mall', 'category',
+]
+
+def initialise():
+    """Runs the startup pipeline exactly once per process: load the processed
+    parquet, optimize dtypes, factorize customer ids and build the RFM table.
+    Everything downstream shares these two frames."""
+    try:
+        # memory_map lets every Gunicorn worker share one page-cache-backed
+        # copy of the column chunks instead of a private read buffer each.
+        df = pq.read_table(DATA_FILE_PATH, columns=ANALYSIS_COLUMNS,
+                           memory_map=True).to_pandas()
+        df = analysis.optimize_dtypes(df)
+        df = analysis.add_customer_codes(df)
+        rfm_df = load_rfm_segments(df)
+        print("✅ Data loaded and initial analysis complete.")
+        return df, rfm_df
+    except FileNotFoundError:
+        print(f"❌ Error: Processed data file not found at '{DATA_FILE_PATH}'")
+        return pd.DataFrame(), pd.DataFrame()
+
+df, rfm_df = initialise()
+
+# --- Static Result Cache ---
+def _load_summary(name: str):
+    """Loads a build-time summary artifact, or None if the pipeline that
+    produced the data predates it."""
+    try:
+        return pd.read_parquet(Path(__file__).parent.parent / 'data' / name)
+    except (FileNotFoundError, OSError):
+        return None
+
+def _json_safe(frame: pd.DataFrame) -> pd.DataFrame:
+    """Upcasts float32 aggregates so their dict values are plain JSON floats."""
+    float32_cols = frame.select_dtypes('float32').columns
+    return frame.astype({col: 'float64' for col in float32_cols}) if len(float32_cols) else frame
+
+def build_static_results(df: pd.DataFrame, rfm_df: pd.DataFrame) -> dict:
+    """Precomputes every endpoint payload that depends only on the loaded data.
+
+    The dataset is immutable for the life of the process, so these results
+    never change; endpoints just hand back the cached dicts. The analyses are
+    independent of each other and pandas releases the GIL inside its C
+    kernels, so the warmup runs them on a thread pool to use every core.
+    """
+    if df.empty or rfm_df.empty:
+        return {}
+
+    # The processing pipeline pre-aggregates these summaries at build time;
+    # recompute from row-level data only when an artifact is missing.
+    stores = _load_summary('store_totals.parquet')
+    monthly = _load_summary('monthly_summary.parquet')
+    quarterly = _load_summary('quarterly_summary.parquet')
+    payments = _load_summary('payment_mix.parquet')
+    discounts = _load_summary('category_discount.parquet')
+
+    with ThreadPoolExecutor() as pool:
+        futures = {
+            'top_customers': pool.submit(analysis.get_top_customers, df),
+            'value_segmentation': pool.submit(analysis.get_customer_value_segmentation, df),
+            'repeat_vs_onetime': pool.submit(analysis.analyze_repeat_vs_onetime_customers, df),
+            'category_by_segment': pool.submit(analysis.get_category_insights_by_segment, df, rfm_df),
+            'segment_profiles': pool.submit(analysis.get_segment_profiles, rfm_df),
+        }
+        if stores is None:
+            futures['store_performance'] = pool.submit(analysis.calculate_store_performance, df)
+        if monthly is None or quarterly is None:
+            futures['seasonality'] = pool.submit(analysis.analyze_seasonality, df)
+        if payments is None:
+            futures['payment_methods'] = pool.submit(analysis.analyze_payment_methods, df)
+        if discounts is None:
+            futures['discount_impact'] = pool.submit(analysis.get_discount_impact, df)
+        results = {name: future.result() for name, future in futures.items()}
+
+    stores = stores if stores is not None else results['store_performance'].reset_index()
+    # Serve the stores table already in tidy record form: the dashboard can
+    # build its frame directly instead of reshaping a dict-of-dicts per rerun.
+    stores = stores.rename(columns={'shopping_mall': 'store', 'sum': 'total_sales',
+                                    'mean': 'avg_sale', 'count': 'transactions'})
+    if monthly is None or quarterly is None:
+        monthly, quarterly = results['seasonality']
+    payments = payments if payments is not None else results['payment_methods']
+    discounts = discounts if discounts is not None else results['discount_impact']
+
+    return {
+        'store_performance': _json_safe(stores).to_dict('records'),
+        'top_customers': _json_safe(results['top_customers']).to_dict('records'),
+        'value_segmentation': results['value_segmentation'].to_dict('records'),
+        'discount_impact': _json_safe(discounts).to_dict('records'),
+        'seasonality': {
+            'monthly': _json_safe(monthly).to_dict('records'),
+            'quarterly': _json_safe(quarterly).to_dict('records')
+        },
+        'payment_methods': payments.to_dict('records'),
+        'repeat_vs_onetime': _json_safe(results['repeat_vs_onetime']).to_dict('records'),
+        'category_by_segment': _json_safe(results['category_by_segment']).to_dict('records'),
+        'segment_profiles': _json_safe(results['segment_profiles']).to_dict('records'),
+    }
+
+static_results = build_static_results(df, rfm_df)
+# The RFM table is the one big tabular payload; serialize it to Arrow once.
+rfm_stream = arrow_stream_bytes(rfm_df) if not rfm_df.empty else b''
+
+# --- API Endpoints ---
+@app.get("/")
+def read_root():
+    return {"message": "Welcome to the Simplified Retail Insights API"}
+
+@app.get("/performance/stores")
+def get_store_performance():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['store_performance']
+
+@app.get("/customers/top-customers")
+def get_top_customers():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['top_customers']
+
+@app.get("/customers/value-segmentation")
+def get_value_segmentation():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['value_segmentation']
+
+@app.get("/insights/discount-impact")
+def get_discount_impact():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['discount_impact']
+
+@app.get("/insights/seasonality")
+def get_seasonality():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['seasonality']
+
+@app.get("/insights/payment-methods")
+def get_payment_methods():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['payment_methods']
+
+@app.get("/customers/segment-profiles")
+def get_segment_profiles():
+    if rfm_df.empty: return {"error": "Data not loaded."}
+    return static_results['segment_profiles']
+
+@app.get("/customers/rfm-segments")
+def get_rfm_segments():
+    if rfm_df.empty: return {"error": "Data not loaded."}
+    return Response(content=rfm_stream, media_type=ARROW_STREAM_MIME)
+
+# --- NEW ENDPOINTS ---
+
+@app.get("/customers/repeat-vs-onetime")
+def get_repeat_vs_onetime():
+    if df.empty: return {"error": "Data not loaded."}
+    return static_results['repeat_vs_onetime']
+
+@app.get("/insights/category-by-segment")
+def get_category_by_segment():
+    if df.empty or rfm_df.empty: return {"error": "Data not loaded."}
+    return static_results['category_by_segment']
+
+@app.get("/simulations/campaign")
+def simulate_campaign(target_segment: str, discount_pct: float = 0.10):
+    if rfm_df.empty: return {"error": "Data not loaded."}
+
+    return analysis.run_campaign_simulation(rfm_df, target_segment, discount_pct)